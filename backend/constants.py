@@ -3,6 +3,7 @@ This file contains the main constants used in the application.
 """
 
 from datetime import datetime, timedelta
+from functools import lru_cache
 from pathlib import Path
 from utils.filter_utils import (
     parse_base_filter_config,
@@ -22,14 +23,6 @@ GENERIC_ATS_DOMAINS = [
 ]
 
 DEFAULT_DAYS_AGO = 30
-# Get the current date
-current_date = datetime.now()
-
-# Subtract 30 days
-date_days_ago = current_date - timedelta(days=DEFAULT_DAYS_AGO)
-
-# Format the date in the required format (YYYY/MM/DD)
-formatted_date = date_days_ago.strftime("%Y/%m/%d")
 
 APPLIED_FILTER_PATH = (
     Path(__file__).parent / "email_query_filters" / "applied_email_filter.yaml"
@@ -39,9 +32,32 @@ APPLIED_FILTER_OVERRIDES_PATH = (
     / "email_query_filters"
     / "applied_email_filter_overrides.yaml"
 )
-QUERY_APPLIED_EMAIL_FILTER = (
-    f"after:{formatted_date} -from:me -in:sent AND ({parse_base_filter_config(APPLIED_FILTER_PATH)})"
-)
+
+
+@lru_cache(maxsize=32)
+def _parse_base_filter_config(filter_path: Path, mtime: float) -> str:
+    return parse_base_filter_config(filter_path)
+
+
+def get_applied_email_filter(filter_path: Path = APPLIED_FILTER_PATH) -> str:
+    """
+    Returns the parsed Gmail query for the filter file.
+    The parse is cached and only redone when the file is modified.
+    """
+    return _parse_base_filter_config(filter_path, filter_path.stat().st_mtime)
+
+
+def get_query_applied_email_filter() -> str:
+    """
+    Returns the applied email query covering the last DEFAULT_DAYS_AGO days.
+    The date is computed per call so long-running workers don't reuse the
+    date from when the module was imported.
+    """
+    # Format the date in the required format (YYYY/MM/DD)
+    formatted_date = (datetime.now() - timedelta(days=DEFAULT_DAYS_AGO)).strftime(
+        "%Y/%m/%d"
+    )
+    return f"after:{formatted_date} -from:me -in:sent AND ({get_applied_email_filter()})"
 
 # ------ implement override filter later!! #
 # OR \n"
@@ -72,4 +72,4 @@ def add_user(user, request, start_date=None) -> Users:
             return new_user
         else:
             logger.info(f"User {user.user_id} already exists in the database.")
-            return existing_user
\ No newline at end of file
+            return existing_user
@@ -1,3 +1,4 @@
+import asyncio
 import datetime
 import logging
 from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
@@ -5,7 +6,11 @@ from fastapi.responses import RedirectResponse, HTMLResponse
 from google_auth_oauthlib.flow import Flow
 
 from db.utils.user_utils import user_exists
-from utils.auth_utils import AuthenticatedUser
+from utils.auth_utils import (
+    AuthenticatedUser,
+    get_google_auth_request,
+    save_creds_to_session,
+)
 from session.session_layer import create_random_session_string, validate_session
 from utils.config_utils import get_settings
 from utils.cookie_utils import set_conditional_cookie
@@ -26,6 +31,7 @@ router = APIRouter()
 
 APP_URL = settings.APP_URL
 
+
 @router.get("/login")
 @limiter.limit("10/minute")
 async def login(request: Request, background_tasks: BackgroundTasks):
@@ -43,7 +49,7 @@ async def login(request: Request, background_tasks: BackgroundTasks):
             return RedirectResponse(url=authorization_url)
         logger.info("Authorization code received, exchanging for token...")
         try:
-            flow.fetch_token(code=code)
+            await asyncio.to_thread(flow.fetch_token, code=code)
         except Exception as e:
             logger.error("Failed to fetch token: %s", e)
             return RedirectResponse(
@@ -60,10 +66,20 @@ async def login(request: Request, background_tasks: BackgroundTasks):
             )  
 
         if not creds.valid:
-            creds.refresh(Request())
-            return RedirectResponse("/login", status_code=303)
-
-        user = AuthenticatedUser(creds)
+            if not creds.refresh_token:
+                # nothing to refresh with, so the user has to consent again
+                return RedirectResponse("/login", status_code=303)
+            # rarely needed, so refresh inline but off the event loop so the
+            # session gets the new token and expiry
+            try:
+                await asyncio.to_thread(
+                    lambda: creds.refresh(get_google_auth_request())
+                )
+            except Exception as e:
+                logger.error("Failed to refresh credentials: %s", e)
+                return RedirectResponse("/login", status_code=303)
+
+        user = await asyncio.to_thread(AuthenticatedUser, creds)
         session_id = request.session["session_id"] = create_random_session_string()
 
         # Set session details
@@ -75,13 +91,12 @@ async def login(request: Request, background_tasks: BackgroundTasks):
                 datetime.datetime.utcnow() + datetime.timedelta(hours=1)
             ).isoformat()
 
+        save_creds_to_session(request.session, creds)
         request.session["token_expiry"] = token_expiry
         request.session["user_id"] = user.user_id
-        request.session["creds"] = creds.to_json() 
-        request.session["access_token"] = creds.token
 
         # NOTE: change redirection once dashboard is completed
-        exists, last_fetched_date = user_exists(user)
+        exists, last_fetched_date = await asyncio.to_thread(user_exists, user)
         if exists:
             logger.info("User already exists in the database.")
             response = RedirectResponse(
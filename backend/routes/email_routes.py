@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import List, Optional
 from fastapi import APIRouter, Depends, Request, HTTPException, BackgroundTasks
@@ -7,16 +8,14 @@ from googleapiclient.discovery import build
 from db.user_emails import UserEmails
 from db import processing_tasks as task_models
 from db.utils.user_email_utils import create_user_email
-from utils.auth_utils import AuthenticatedUser
-from utils.email_utils import get_email_ids, get_email
+from utils.auth_utils import AuthenticatedUser, get_user_creds
+from utils.email_utils import GMAIL_BATCH_SIZE, get_email_ids, get_emails_batch
 from utils.llm_utils import process_email
 from utils.config_utils import get_settings
 from session.session_layer import validate_session
 import database
-from google.oauth2.credentials import Credentials
-import json
 from start_date.storage import get_start_date_email_filter
-from constants import QUERY_APPLIED_EMAIL_FILTER
+from constants import get_query_applied_email_filter
 from datetime import datetime, timedelta
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -136,17 +135,14 @@ async def start_fetch_emails(
     if not user_id:
         raise HTTPException(status_code=403, detail="Unauthorized")
     logger.info(f"user_id:{user_id} start_fetch_emails")
-    # Retrieve stored credentials
-    creds_json = request.session.get("creds")
-    if not creds_json:
-        logger.error(f"Missing credentials for user_id: {user_id}")
-        return HTMLResponse(content="User not authenticated. Please log in again.", status_code=401)
-
     try:
-        # Convert JSON string back to Credentials object
-        creds_dict = json.loads(creds_json)
-        creds = Credentials.from_authorized_user_info(creds_dict)  # Convert dict to Credentials
-        user = AuthenticatedUser(creds)
+        # Retrieve stored credentials
+        creds = get_user_creds(request.session)
+        if not creds:
+            logger.error(f"Missing credentials for user_id: {user_id}")
+            return HTMLResponse(content="User not authenticated. Please log in again.", status_code=401)
+        # verifying the ID token may refresh the credentials over HTTPS
+        user = await asyncio.to_thread(AuthenticatedUser, creds)
 
         logger.info(f"Starting email fetching process for user_id: {user_id}")
 
@@ -202,7 +198,7 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
             # for example, if the newest email you’ve stored was received at 2025‑03‑20 14:32 UTC, we convert that to 1710901920s 
             # and tell Gmail to fetch only messages received after March 20, 2025 at 14:32 UTC.
             if not start_date or not is_new_user:
-                query = QUERY_APPLIED_EMAIL_FILTER
+                query = get_query_applied_email_filter()
                 query += f" after:{additional_time}"
             
                 logger.info(f"user_id:{user_id} Fetching emails after {last_updated.isoformat()}")
@@ -232,6 +228,7 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
         db_session.commit()
 
         email_records = []  # list to collect email records
+        fetched_emails = {}
 
         for idx, message in enumerate(messages):
             message_data = {}
@@ -243,7 +240,14 @@ def fetch_emails_to_db(user: AuthenticatedUser, request: Request, last_updated:
             process_task_run.processed_emails = idx + 1
             db_session.commit()
 
-            msg = get_email(message_id=msg_id, gmail_instance=service, user_email=user.user_email)
+            if idx % GMAIL_BATCH_SIZE == 0:
+                # fetch the next batch of emails in a single request
+                fetched_emails = get_emails_batch(
+                    [m["id"] for m in messages[idx : idx + GMAIL_BATCH_SIZE]],
+                    gmail_instance=service,
+                    user_email=user.user_email,
+                )
+            msg = fetched_emails.get(msg_id)
 
             if msg:
                 try:
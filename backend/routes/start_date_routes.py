@@ -1,10 +1,9 @@
+import asyncio
 import logging
 from fastapi import APIRouter, Request, Form, Depends
 from fastapi.responses import JSONResponse, HTMLResponse
 from db.utils.user_utils import add_user
-import json
-from utils.auth_utils import AuthenticatedUser
-from google.oauth2.credentials import Credentials
+from utils.auth_utils import AuthenticatedUser, get_user_creds
 from session.session_layer import validate_session
 from slowapi import Limiter
 from slowapi.util import get_remote_address
@@ -28,20 +27,17 @@ async def set_start_date(request: Request, start_date: str = Form(...), user_id:
     if not user_id:
         return HTMLResponse(content="Invalid request. Please log in again.", status_code=400)
 
-    # Retrieve stored credentials
-    creds_json = request.session.get("creds")
-    if not creds_json:
-        logger.error(f"user_id:{user_id} missing credentials /set-start-date")
-        return HTMLResponse(content="User not authenticated. Please log in again.", status_code=401)
-
     try:
-        # Convert JSON string back to Credentials object
-        creds_dict = json.loads(creds_json)
-        creds = Credentials.from_authorized_user_info(creds_dict)  # Convert dict to Credentials
-        user = AuthenticatedUser(creds, start_date)  # Corrected: Now passing Credentials object
+        # Retrieve stored credentials
+        creds = get_user_creds(request.session)
+        if not creds:
+            logger.error(f"user_id:{user_id} missing credentials /set-start-date")
+            return HTMLResponse(content="User not authenticated. Please log in again.", status_code=401)
+        # verifying the ID token may refresh the credentials over HTTPS
+        user = await asyncio.to_thread(AuthenticatedUser, creds, start_date)
 
         # Save start date in DB
-        add_user(user, request, start_date)
+        await asyncio.to_thread(add_user, user, request, start_date)
 
         # Update session to remove "new user" status
         request.session["is_new_user"] = False
@@ -1,21 +1,14 @@
 """
 This file contains the main constants used in the application.
 """
-from pathlib import Path
-from utils.filter_utils import (
-    parse_base_filter_config,
-)
-from constants import QUERY_APPLIED_EMAIL_FILTER
+from constants import get_applied_email_filter, get_query_applied_email_filter
 
-APPLIED_FILTER_PATH = (
-    Path(__file__).parent.parent / "email_query_filters" / "applied_email_filter.yaml"
-)
 
 def get_start_date_email_filter(start_date: str) -> str:
     if not start_date:
-        return QUERY_APPLIED_EMAIL_FILTER
+        return get_query_applied_email_filter()
 
     START_DATE_EMAIL_FILTER = (
-        f"after:{start_date} AND ({parse_base_filter_config(APPLIED_FILTER_PATH)})"
+        f"after:{start_date} AND ({get_applied_email_filter()})"
     )
     return START_DATE_EMAIL_FILTER
\ No newline at end of file
@@ -33,6 +33,8 @@ def logged_in_user(db_session, client):
         **{
             "expiry": datetime.utcnow() + timedelta(seconds=10),
             "token": "fake access token",
+            "id_token": "fake id token",
+            "refresh_token": "fake refresh token",
             "to_json.return_value": {"foo": "bar"},
         }
     )
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta
+from unittest import mock
+
+
+def login(client, credentials):
+    mock_decoded_token = {"sub": "123", "email": "user@example.com"}
+    with (
+        mock.patch(
+            "routes.auth_routes.Flow",
+            **{"from_client_secrets_file.return_value.credentials": credentials},
+        ),
+        mock.patch(
+            "utils.auth_utils.id_token",
+            **{"verify_oauth2_token.return_value": mock_decoded_token},
+        ),
+    ):
+        return client.get("/login", params={"code": "abc"}, follow_redirects=False)
+
+
+def test_login_refreshes_stale_credentials_before_saving_session(db_session, client):
+    mock_credentials = mock.Mock(
+        **{
+            "valid": False,
+            "expiry": datetime.utcnow() - timedelta(seconds=10),
+            "token": "stale access token",
+            "id_token": "fake id token",
+            "refresh_token": "fake refresh token",
+        }
+    )
+
+    def refresh(request):
+        mock_credentials.token = "fresh access token"
+        mock_credentials.expiry = datetime.utcnow() + timedelta(hours=1)
+
+    mock_credentials.refresh.side_effect = refresh
+
+    auth_resp = login(client, mock_credentials)
+    assert auth_resp.status_code == 303
+    assert auth_resp.headers["Location"] == "http://localhost:3000/dashboard"
+    mock_credentials.refresh.assert_called_once()
+
+    # the session written by login holds the refreshed expiry, so it is still valid
+    me_resp = client.get("/me")
+    assert me_resp.status_code == 200
+    assert me_resp.json() == {"user_id": "123"}
+
+
+def test_login_without_refresh_token_restarts_login(db_session, client):
+    mock_credentials = mock.Mock(**{"valid": False, "refresh_token": None})
+
+    auth_resp = login(client, mock_credentials)
+
+    assert auth_resp.status_code == 303
+    assert auth_resp.headers["Location"] == "/login"
+    mock_credentials.refresh.assert_not_called()
@@ -1,14 +1,18 @@
+import base64
 from utils import auth_utils
 from unittest import mock
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from fastapi import Request
 from sqlalchemy.orm import Session
 from google.oauth2.credentials import Credentials
+from googleapiclient.errors import HttpError
+import httplib2
 
 from db.users import Users
 from db.processing_tasks import TaskRuns, FINISHED, STARTED
 from routes.email_routes import fetch_emails_to_db
+from utils.email_utils import GMAIL_BATCH_SIZE
 
 
 def test_processing(db_session, client, logged_in_user):
@@ -73,3 +77,216 @@ def test_fetch_emails_to_db_in_progress_rate_limited_no_processing(db_session: S
     mock_get_email_ids.assert_not_called()
     task_run = db_session.get(TaskRuns, test_user_id)
     assert task_run.status == STARTED
+
+
+def test_fetch_emails_without_session_tokens_asks_to_log_in(db_session, client):
+    # log in with credentials that leave no refresh token in the session
+    mock_credentials = mock.Mock(
+        **{
+            "expiry": datetime.utcnow() + timedelta(hours=1),
+            "token": "fake access token",
+            "id_token": "fake id token",
+            "refresh_token": None,
+        }
+    )
+    mock_decoded_token = {"sub": "123", "email": "user@example.com"}
+
+    with (
+        mock.patch(
+            "routes.auth_routes.Flow",
+            **{"from_client_secrets_file.return_value.credentials": mock_credentials},
+        ),
+        mock.patch(
+            "utils.auth_utils.id_token",
+            **{"verify_oauth2_token.return_value": mock_decoded_token},
+        ),
+        mock.patch("routes.auth_routes.fetch_emails_to_db"),
+    ):
+        auth_resp = client.get("/login", params={"code": "abc"}, follow_redirects=False)
+        assert auth_resp.status_code == 303
+
+    with mock.patch("routes.email_routes.fetch_emails_to_db") as mock_fetch_emails_to_db:
+        resp = client.post("/fetch-emails")
+
+    assert resp.status_code == 401, resp.text
+    mock_fetch_emails_to_db.assert_not_called()
+
+
+def test_fetch_emails_rebuilds_user_from_session(db_session, client, logged_in_user):
+    def refresh(creds, request):
+        # session credentials carry no ID token, so verifying the user refreshes them
+        creds.token = "fresh access token"
+        creds._id_token = "fake id token"
+
+    with (
+        mock.patch.object(
+            auth_utils, "get_client_config", return_value={
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "client_id": "client-id",
+                "client_secret": "client-secret",
+            }
+        ),
+        mock.patch.object(Credentials, "refresh", autospec=True, side_effect=refresh) as mock_refresh,
+        mock.patch(
+            "utils.auth_utils.id_token",
+            **{"verify_oauth2_token.return_value": {"sub": "123", "email": "user@example.com"}},
+        ),
+        mock.patch("routes.email_routes.fetch_emails_to_db") as mock_fetch_emails_to_db,
+    ):
+        resp = client.post("/fetch-emails")
+
+    assert resp.status_code == 200, resp.text
+    mock_refresh.assert_called_once()
+    user = mock_fetch_emails_to_db.call_args.args[0]
+    assert user.user_id == "123"
+    assert user.creds.refresh_token == "fake refresh token"
+    assert user.creds.token == "fresh access token"
+
+
+def test_fetch_emails_to_db_fetches_in_batches(db_session: Session):
+    test_user_id = "123"
+
+    db_session.add(
+        Users(
+            user_id=test_user_id,
+            user_email="user123@example.com",
+            start_date=datetime(2000, 1, 1),
+        )
+    )
+    db_session.commit()
+
+    messages = [{"id": f"msg{i}"} for i in range(2 * GMAIL_BATCH_SIZE + 5)]
+    failed_batch_ids = {m["id"] for m in messages[GMAIL_BATCH_SIZE : 2 * GMAIL_BATCH_SIZE]}
+
+    def get_emails_batch(message_ids, gmail_instance, user_email):
+        if set(message_ids) == failed_batch_ids:
+            return {}  # the whole batch request failed
+        return {
+            message_id: {
+                "text_content": message_id,
+                "date": "Thu, 2 May 2024 16:45:00 +0000",
+                "subject": f"subject of {message_id}",
+                "from": "recruiter@example.com",
+            }
+            for message_id in message_ids
+        }
+
+    def process_email(text_content):
+        return {
+            "company_name": f"company of {text_content}",
+            "job_application_status": "applied",
+            "job_title": "engineer",
+        }
+
+    with (
+        mock.patch("routes.email_routes.get_email_ids", return_value=messages),
+        mock.patch(
+            "routes.email_routes.get_emails_batch", side_effect=get_emails_batch
+        ) as mock_get_emails_batch,
+        mock.patch("routes.email_routes.process_email", side_effect=process_email),
+        mock.patch(
+            "routes.email_routes.create_user_email", return_value=None
+        ) as mock_create_user_email,
+    ):
+        fetch_emails_to_db(
+            auth_utils.AuthenticatedUser(Credentials("abc")),
+            Request({"type": "http", "session": {}}),
+            user_id=test_user_id,
+        )
+
+    # one request per slice of GMAIL_BATCH_SIZE messages, in order
+    assert [call.args[0] for call in mock_get_emails_batch.call_args_list] == [
+        [m["id"] for m in messages[start : start + GMAIL_BATCH_SIZE]]
+        for start in range(0, len(messages), GMAIL_BATCH_SIZE)
+    ]
+
+    # messages from the failed batch are skipped, the rest keep their own content
+    saved = [call.args[1] for call in mock_create_user_email.call_args_list]
+    expected_ids = [m["id"] for m in messages if m["id"] not in failed_batch_ids]
+    assert [message_data["id"] for message_data in saved] == expected_ids
+    for message_data in saved:
+        assert message_data["company_name"] == f"company of {message_data['id']}"
+        assert message_data["subject"] == f"subject of {message_data['id']}"
+
+    task_run = db_session.get(TaskRuns, test_user_id)
+    assert task_run.status == FINISHED
+    assert task_run.processed_emails == len(messages)
+
+
+def test_fetch_emails_to_db_retries_rate_limited_email(db_session: Session):
+    test_user_id = "123"
+
+    db_session.add(
+        Users(
+            user_id=test_user_id,
+            user_email="user123@example.com",
+            start_date=datetime(2000, 1, 1),
+        )
+    )
+    db_session.commit()
+
+    raw_message = base64.urlsafe_b64encode(
+        b"From: recruiter@example.com\r\n"
+        b"Subject: Thanks for applying\r\n"
+        b"Date: Thu, 2 May 2024 16:45:00 +0000\r\n"
+        b"Content-Type: text/plain\r\n\r\n"
+        b"We received your application."
+    ).decode("ASCII")
+    rate_limited_once = set()
+
+    class FakeBatch:
+        def __init__(self, callback):
+            self.callback = callback
+            self.request_ids = []
+
+        def add(self, request, request_id):
+            self.request_ids.append(request_id)
+
+        def execute(self):
+            for request_id in self.request_ids:
+                if request_id == "msg1" and request_id not in rate_limited_once:
+                    rate_limited_once.add(request_id)
+                    self.callback(
+                        request_id,
+                        None,
+                        HttpError(httplib2.Response({"status": 429}), b"Too many concurrent requests"),
+                    )
+                else:
+                    self.callback(request_id, {"raw": raw_message}, None)
+
+    service = mock.MagicMock()
+    service.new_batch_http_request.side_effect = lambda callback: FakeBatch(callback)
+
+    with (
+        mock.patch("routes.email_routes.build", return_value=service),
+        mock.patch(
+            "routes.email_routes.get_email_ids",
+            return_value=[{"id": "msg0"}, {"id": "msg1"}, {"id": "msg2"}],
+        ),
+        mock.patch(
+            "routes.email_routes.process_email",
+            return_value={
+                "company_name": "Acme",
+                "job_application_status": "applied",
+                "job_title": "engineer",
+            },
+        ),
+        mock.patch(
+            "routes.email_routes.create_user_email", return_value=None
+        ) as mock_create_user_email,
+        mock.patch("utils.email_utils.time.sleep"),
+    ):
+        fetch_emails_to_db(
+            auth_utils.AuthenticatedUser(Credentials("abc")),
+            Request({"type": "http", "session": {}}),
+            user_id=test_user_id,
+        )
+
+    # the rate limited email was fetched again and saved with the others
+    assert rate_limited_once == {"msg1"}
+    saved = [call.args[1] for call in mock_create_user_email.call_args_list]
+    assert [message_data["id"] for message_data in saved] == ["msg0", "msg1", "msg2"]
+    assert all(message_data["subject"] == "Thanks for applying" for message_data in saved)
+
+    task_run = db_session.get(TaskRuns, test_user_id)
+    assert task_run.status == FINISHED
@@ -0,0 +1,103 @@
+import threading
+import time
+from datetime import datetime
+from unittest import mock
+
+import pytest
+
+import utils.auth_utils as auth_utils
+
+
+CLIENT_CONFIG = {
+    "token_uri": "https://oauth2.googleapis.com/token",
+    "client_id": "client-id",
+    "client_secret": "client-secret",
+}
+
+
+@pytest.fixture(autouse=True)
+def clear_verified_token_cache():
+    auth_utils._verified_token_cache.clear()
+    yield
+    auth_utils._verified_token_cache.clear()
+
+
+def test_verify_id_token_reuses_unexpired_result():
+    decoded_token = {"sub": "123", "exp": time.time() + 3600}
+    with mock.patch(
+        "utils.auth_utils.id_token",
+        **{"verify_oauth2_token.return_value": decoded_token},
+    ) as mock_id_token:
+        assert auth_utils.verify_id_token("token") == decoded_token
+        assert auth_utils.verify_id_token("token") == decoded_token
+        mock_id_token.verify_oauth2_token.assert_called_once()
+
+
+def test_verify_id_token_reverifies_expired_result():
+    decoded_token = {"sub": "123", "exp": time.time() + 1}
+    with mock.patch(
+        "utils.auth_utils.id_token",
+        **{"verify_oauth2_token.return_value": decoded_token},
+    ) as mock_id_token:
+        auth_utils.verify_id_token("token")
+        auth_utils.verify_id_token("token")
+        assert mock_id_token.verify_oauth2_token.call_count == 2
+
+
+def test_verify_id_token_evicts_oldest_entry():
+    with (
+        mock.patch.object(auth_utils, "VERIFIED_TOKEN_CACHE_MAX_SIZE", 2),
+        mock.patch(
+            "utils.auth_utils.id_token",
+            **{"verify_oauth2_token.side_effect": lambda token, *args, **kwargs: {
+                "sub": token,
+                "exp": time.time() + 3600,
+            }},
+        ) as mock_id_token,
+    ):
+        for token in ("a", "b", "c"):
+            auth_utils.verify_id_token(token)
+        assert len(auth_utils._verified_token_cache) == 2
+
+        auth_utils.verify_id_token("a")
+        assert mock_id_token.verify_oauth2_token.call_count == 4
+
+
+def test_session_creds_round_trip():
+    creds = mock.Mock(
+        token="access-token",
+        refresh_token="refresh-token",
+        expiry=datetime(2030, 1, 1, 12, 0),
+    )
+    session = {}
+    auth_utils.save_creds_to_session(session, creds)
+
+    assert "client-secret" not in str(session)
+    # token_expiry is the session validity key, owned by login
+    assert "token_expiry" not in session
+    with mock.patch.object(auth_utils, "get_client_config", return_value=CLIENT_CONFIG):
+        restored_creds = auth_utils.get_user_creds(session)
+
+    assert restored_creds.token == "access-token"
+    assert restored_creds.refresh_token == "refresh-token"
+    assert restored_creds.expiry == datetime(2030, 1, 1, 12, 0)
+    assert restored_creds.client_secret == "client-secret"
+
+
+def test_get_google_auth_request_is_per_thread():
+    google_auth_request = auth_utils.get_google_auth_request()
+    assert auth_utils.get_google_auth_request() is google_auth_request
+
+    other_thread_requests = []
+    thread = threading.Thread(
+        target=lambda: other_thread_requests.append(auth_utils.get_google_auth_request())
+    )
+    thread.start()
+    thread.join()
+
+    assert other_thread_requests[0] is not google_auth_request
+    # cached certs are still shared between threads
+    assert (
+        other_thread_requests[0].session.adapters["https://"].cache
+        is google_auth_request.session.adapters["https://"].cache
+    )
@@ -1,4 +1,10 @@
+import os
+import shutil
+from datetime import datetime
 from pathlib import Path
+from unittest import mock
+
+import constants
 
 SUBJECT_LINE = "Invitation from an unknown sender: Interview with TestCompanyName @ Thu May 2, 2024 11:00am - 12pm (PDT) (appuser@gmail.com)"
 SAMPLE_MESSAGE = {
@@ -224,3 +230,37 @@ EXPECTED_SAMPLE_QUERY_STRING = """(subject:"application has been submitted"
     OR from:"do-not-reply@jobs.microsoft.com" 
     AND -from:"no-reply@comet.zillow.com" 
     AND -subject:"watering")"""
+
+
+def test_get_query_applied_email_filter_computes_date_per_call():
+    with (
+        mock.patch("constants.get_applied_email_filter", return_value="FILTER"),
+        mock.patch("constants.datetime") as mock_datetime,
+    ):
+        mock_datetime.now.return_value = datetime(2025, 3, 31)
+        assert constants.get_query_applied_email_filter() == (
+            "after:2025/03/01 -from:me -in:sent AND (FILTER)"
+        )
+
+        # a long-running worker sees the date move with the clock
+        mock_datetime.now.return_value = datetime(2025, 4, 30)
+        assert constants.get_query_applied_email_filter().startswith("after:2025/03/31 ")
+
+
+def test_get_applied_email_filter_reparses_only_modified_file(tmp_path):
+    filter_path = tmp_path / "applied_email_filter.yaml"
+    shutil.copy(SAMPLE_FILTER_PATH, filter_path)
+    os.utime(filter_path, (1_000_000, 1_000_000))
+
+    with mock.patch(
+        "constants.parse_base_filter_config",
+        wraps=constants.parse_base_filter_config,
+    ) as mock_parse:
+        query = constants.get_applied_email_filter(filter_path)
+        assert constants.get_applied_email_filter(filter_path) == query
+        assert mock_parse.call_count == 1
+
+        # touching the file makes the next call parse it again
+        os.utime(filter_path, (2_000_000, 2_000_000))
+        assert constants.get_applied_email_filter(filter_path) == query
+        assert mock_parse.call_count == 2
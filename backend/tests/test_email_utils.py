@@ -1,5 +1,8 @@
+import base64
 from unittest import mock
+import httplib2
 import pytest
+from googleapiclient.errors import HttpError
 
 from tests.test_constants import SAMPLE_MESSAGE, SUBJECT_LINE
 import utils.email_utils as email_utils
@@ -28,6 +31,13 @@ def test_get_top_consecutive_capitalized_words():
             ("how", 5),  # capitalized, highest frequency, add to result
             ("are", 5),  # not capitalized, highest frequency, ignore
         ): "",  # no consecutive capitalized words
+        (
+            ("", 20),  # empty word, ignore
+            ("the", 12),  # not capitalized, highest frequency, ignore
+            ("Acme", 7),  # capitalized, prioritize
+            ("Robotics", 7),  # capitalized, same frequency, add to result
+            ("Careers", 3),  # capitalized, lower frequency, ignore
+        ): "Acme Robotics",
     }
     for word_list, expected_value in test_cases.items():
         result = email_utils.get_top_consecutive_capitalized_words(word_list)
@@ -37,7 +47,8 @@ def test_get_top_consecutive_capitalized_words():
 def test_is_valid_email():
     email_test_cases = {
         "no-reply@gmail.com": True,
-        "no-reply@example.com": False,  # Invalid domain
+        "no-reply@example.com": True,  # Valid syntax, deliverability is not checked
+        "no-reply@localhost": False,  # Special-use domain
         "no-reply.com": False,  # Missing @
     }
     for email, expected_value in email_test_cases.items():
@@ -53,6 +64,11 @@ def test_is_email_automated():
         "do-not-reply@example.com": True,
         "notifications@smartrecruiters.com": True,
         "person@yesimreal.com": False,
+        "NoReply@Example.com": True,
+        "do_not.reply@example.com": True,
+        "team.lead@example.com": False,
+        "recruiter@careers.smartrecruiters.com": False,
+        "no-reply": False,
     }
     for email, expected_value in email_test_cases.items():
         is_automated = email_utils.is_automated_email(email)
@@ -67,6 +83,23 @@ def test_get_email_subject_line():
     )
 
 
+def test_get_email_header_map_keeps_first_repeated_header():
+    msg = {
+        "payload": {
+            "headers": [
+                {"name": "Received", "value": "by first.example.com"},
+                {"name": "Subject", "value": "Thanks for applying"},
+                {"name": "Received", "value": "by second.example.com"},
+            ]
+        }
+    }
+    header_map = email_utils.get_email_header_map(msg)
+
+    assert header_map == {"Received": "by first.example.com", "Subject": "Thanks for applying"}
+    # the message itself is left untouched
+    assert set(msg) == {"payload"}
+
+
 def test_get_email_from_address():
     from_address = email_utils.get_email_from_address(SAMPLE_MESSAGE)
     assert from_address == "recruitername@testcompanyname.com"
@@ -169,3 +202,202 @@ def test_clean_whitespace():
     assert email_utils.clean_whitespace("") == ""
     assert email_utils.clean_whitespace(None) == ""
     
+
+
+def test_get_emails_batch():
+    raw_message = base64.urlsafe_b64encode(
+        b"From: Recruiter <recruiter@example.com>\r\n"
+        b"To: appuser@gmail.com\r\n"
+        b"Subject: Thanks for applying\r\n"
+        b"Content-Type: text/plain\r\n\r\n"
+        b"We received your application."
+    ).decode("ASCII")
+
+    class FakeBatch:
+        def __init__(self, callback):
+            self.callback = callback
+            self.request_ids = []
+
+        def add(self, request, request_id):
+            self.request_ids.append(request_id)
+
+        def execute(self):
+            self.callback("abc", {"raw": raw_message}, None)
+            self.callback("def", None, Exception("not found"))
+
+    gmail_instance = mock.MagicMock()
+    gmail_instance.new_batch_http_request.side_effect = lambda callback: FakeBatch(callback)
+
+    emails = email_utils.get_emails_batch(["abc", "def"], gmail_instance=gmail_instance)
+
+    assert emails["abc"]["subject"] == "Thanks for applying"
+    assert emails["abc"]["raw_text_content"] == "We received your application."
+    assert emails["def"] == {}
+
+
+class FakeRetryBatch:
+    """Batch whose responses come from the queue of callback results per message id."""
+
+    def __init__(self, callback, responses, executed):
+        self.callback = callback
+        self.responses = responses
+        self.executed = executed
+        self.request_ids = []
+
+    def add(self, request, request_id):
+        if request_id in self.request_ids:
+            raise KeyError("A request with this ID already exists: %s" % request_id)
+        self.request_ids.append(request_id)
+
+    def execute(self):
+        self.executed.append(list(self.request_ids))
+        for request_id in self.request_ids:
+            message, exception = self.responses[request_id].pop(0)
+            self.callback(request_id, message, exception)
+
+
+def rate_limit_error():
+    return HttpError(httplib2.Response({"status": 429}), b"Too many concurrent requests for user")
+
+
+def test_get_emails_batch_retries_rate_limited_messages():
+    raw_message = base64.urlsafe_b64encode(
+        b"Subject: Thanks for applying\r\n"
+        b"Content-Type: text/plain\r\n\r\n"
+        b"We received your application."
+    ).decode("ASCII")
+    responses = {
+        "abc": [({"raw": raw_message}, None)],
+        "def": [(None, rate_limit_error()), ({"raw": raw_message}, None)],
+    }
+    executed = []
+    gmail_instance = mock.MagicMock()
+    gmail_instance.new_batch_http_request.side_effect = lambda callback: FakeRetryBatch(
+        callback, responses, executed
+    )
+
+    with mock.patch("utils.email_utils.time.sleep") as mock_sleep:
+        emails = email_utils.get_emails_batch(["abc", "def", "abc"], gmail_instance=gmail_instance)
+
+    # duplicate ids are requested once, and only the rate limited message is retried
+    assert executed == [["abc", "def"], ["def"]]
+    mock_sleep.assert_called_once_with(email_utils.GMAIL_BATCH_RETRY_DELAY_SECONDS)
+    assert emails["abc"]["subject"] == "Thanks for applying"
+    assert emails["def"]["subject"] == "Thanks for applying"
+
+
+def test_get_emails_batch_gives_up_after_retries():
+    responses = {
+        "abc": [(None, rate_limit_error()) for _ in range(email_utils.GMAIL_BATCH_RETRIES)],
+    }
+    executed = []
+    gmail_instance = mock.MagicMock()
+    gmail_instance.new_batch_http_request.side_effect = lambda callback: FakeRetryBatch(
+        callback, responses, executed
+    )
+
+    with mock.patch("utils.email_utils.time.sleep") as mock_sleep:
+        emails = email_utils.get_emails_batch(["abc"], gmail_instance=gmail_instance)
+
+    assert len(executed) == email_utils.GMAIL_BATCH_RETRIES
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [1, 2, 4]
+    assert emails == {"abc": {}}
+
+
+def test_get_email_ids_skips_repeated_ids():
+    gmail_instance = mock.MagicMock()
+    gmail_instance.users().messages().list().execute.side_effect = [
+        {"messages": [{"id": "abc"}, {"id": "def"}], "nextPageToken": "page2"},
+        # a new email arrived mid-scan and pushed "def" onto the next page
+        {"messages": [{"id": "def"}, {"id": "ghi"}]},
+    ]
+
+    email_ids = email_utils.get_email_ids(query="q", gmail_instance=gmail_instance)
+
+    assert [message["id"] for message in email_ids] == ["abc", "def", "ghi"]
+
+
+def test_get_word_frequency():
+    word_frequency = email_utils.get_word_frequency(["Acme  apply Acme role Acme apply"])
+    assert word_frequency == [("Acme", 3), ("apply", 2), ("role", 1)]
+
+
+
+def email_body_part(mime_type, text=None):
+    body = {}
+    if text is not None:
+        body["data"] = base64.urlsafe_b64encode(text.encode("utf-8")).decode("ASCII")
+    return {"mimeType": mime_type, "body": body}
+
+
+def test_get_top_word_in_email_body_skips_part_without_data():
+    msg = {
+        "payload": {
+            "parts": [
+                email_body_part("text/plain"),
+                email_body_part("text/plain", "Acme Acme hiring"),
+            ]
+        }
+    }
+    with mock.patch(
+        "utils.email_utils.clean_email", side_effect=lambda text: [text]
+    ) as mock_clean_email:
+        top_word = email_utils.get_top_word_in_email_body("abc", msg)
+
+    mock_clean_email.assert_called_once_with("Acme Acme hiring")
+    assert top_word == "Acme"
+
+
+def test_get_top_word_in_email_body_plain_text_skips_html_parsing():
+    msg = {"payload": {"parts": [email_body_part("text/plain", "Acme Acme <b>hiring</b>")]}}
+    with (
+        mock.patch("utils.email_utils.BeautifulSoup") as mock_beautiful_soup,
+        mock.patch(
+            "utils.email_utils.clean_email", side_effect=lambda text: [text]
+        ) as mock_clean_email,
+    ):
+        email_utils.get_top_word_in_email_body("abc", msg)
+
+    mock_beautiful_soup.assert_not_called()
+    # plain text is passed through as is, even if it looks like markup
+    mock_clean_email.assert_called_once_with("Acme Acme <b>hiring</b>")
+
+
+def test_get_top_word_in_email_body_strips_html_markup():
+    html = (
+        "<html><head><title>Acme</title></head>"
+        "<body><p>Acme</p><p>is <b>hiring</b></p></body></html>"
+    )
+    msg = {"payload": {"parts": [email_body_part("text/html", html)]}}
+    with (
+        mock.patch(
+            "utils.email_utils.BeautifulSoup", side_effect=email_utils.BeautifulSoup
+        ) as mock_beautiful_soup,
+        mock.patch(
+            "utils.email_utils.clean_email", side_effect=lambda text: [text]
+        ) as mock_clean_email,
+    ):
+        top_word = email_utils.get_top_word_in_email_body("abc", msg)
+
+    mock_beautiful_soup.assert_called_once_with(html.encode("utf-8"), "lxml")
+    mock_clean_email.assert_called_once_with("Acme Acme is hiring")
+    assert top_word == "Acme"
+
+
+def test_clean_emails_runs_one_batched_pass():
+    with mock.patch("utils.email_utils.get_email_cleaner") as mock_get_email_cleaner:
+        mock_get_email_cleaner.return_value.clean.side_effect = lambda bodies, **kwargs: [
+            body.lower() for body in bodies
+        ]
+        cleaned = email_utils.clean_emails(["First Body", "Second Body", "Third Body"])
+
+    mock_get_email_cleaner.return_value.clean.assert_called_once_with(
+        ["First Body", "Second Body", "Third Body"], n_process=1, batch_size=64
+    )
+    assert cleaned == ["first body", "second body", "third body"]
+
+
+def test_clean_emails_returns_empty_list_on_error():
+    with mock.patch("utils.email_utils.get_email_cleaner") as mock_get_email_cleaner:
+        mock_get_email_cleaner.return_value.clean.side_effect = Exception("model missing")
+        assert email_utils.clean_emails(["First Body"]) == []
@@ -1,5 +1,17 @@
+import hashlib
+import json
 import logging
+import threading
+import time
 import uuid
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+from typing import Optional
+
+import cachecontrol
+import requests
+from cachecontrol.cache import DictCache
 
 from utils.file_utils import get_user_filepath
 
@@ -13,6 +25,124 @@ logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+# Google serves its OAuth2 signing certs with a Cache-Control max-age, so one
+# shared (thread-safe) cache lets ID token verification skip the certs fetch
+# on most logins, whichever thread handles them.
+_google_certs_cache = DictCache()
+_google_auth_requests = threading.local()
+
+
+def get_google_auth_request() -> Request:
+    """
+    Returns this thread's transport for google-auth verify/refresh calls.
+    requests.Session isn't thread-safe, so each worker thread keeps its own
+    session, and with it keep-alive connections to Google.
+    """
+    google_auth_request = getattr(_google_auth_requests, "request", None)
+    if google_auth_request is None:
+        google_auth_request = Request(
+            session=cachecontrol.CacheControl(
+                requests.Session(), cache=_google_certs_cache
+            )
+        )
+        _google_auth_requests.request = google_auth_request
+    return google_auth_request
+
+# Verified ID token claims, keyed by the SHA-256 of the token and kept until the
+# token's own `exp`. Re-validating an unexpired token we already checked is
+# safe and skips the RSA signature verification on repeat logins.
+VERIFIED_TOKEN_CACHE_MAX_SIZE = 1024
+VERIFIED_TOKEN_EXPIRY_SKEW_SECONDS = 30
+_verified_token_cache: "OrderedDict[bytes, tuple[dict, float]]" = OrderedDict()
+_verified_token_cache_lock = threading.Lock()
+
+
+def verify_id_token(token: str) -> dict:
+    """
+    Verifies a Google ID token and returns its decoded claims.
+    Results are memoized until the token expires.
+    """
+    key = hashlib.sha256(token.encode()).digest()
+    with _verified_token_cache_lock:
+        cached = _verified_token_cache.get(key)
+        if cached:
+            decoded_token, expires_at = cached
+            if expires_at > time.time() + VERIFIED_TOKEN_EXPIRY_SKEW_SECONDS:
+                _verified_token_cache.move_to_end(key)
+                return decoded_token
+            del _verified_token_cache[key]
+
+    decoded_token = id_token.verify_oauth2_token(
+        token, get_google_auth_request(), audience=settings.GOOGLE_CLIENT_ID
+    )
+
+    expires_at = decoded_token.get("exp")
+    if expires_at:
+        with _verified_token_cache_lock:
+            _verified_token_cache[key] = (decoded_token, float(expires_at))
+            _verified_token_cache.move_to_end(key)
+            while len(_verified_token_cache) > VERIFIED_TOKEN_CACHE_MAX_SIZE:
+                _verified_token_cache.popitem(last=False)
+    return decoded_token
+
+
+@lru_cache
+def get_client_config() -> dict:
+    """Returns the OAuth client settings from the client secrets file."""
+    with open(settings.CLIENT_SECRETS_FILE) as f:
+        client_config = json.load(f)
+    return client_config.get("web") or client_config.get("installed")
+
+
+def build_creds(
+    refresh_token: str, token: Optional[str] = None, expiry: Optional[datetime] = None
+) -> Credentials:
+    """
+    Builds Google OAuth2 credentials from the per-user tokens, filling in
+    the client settings from the client secrets file.
+    """
+    client_config = get_client_config()
+    return Credentials(
+        token,
+        refresh_token=refresh_token,
+        token_uri=client_config["token_uri"],
+        client_id=client_config["client_id"],
+        client_secret=client_config["client_secret"],
+        scopes=settings.GOOGLE_SCOPES,
+        expiry=expiry,
+    )
+
+
+def save_creds_to_session(session: dict, creds: Credentials) -> None:
+    """
+    Stores only the per-user parts of the credentials in the session.
+    The client settings are rebuilt from the client secrets file, which keeps
+    the session cookie small and the client secret out of it.
+    """
+    session["access_token"] = creds.token
+    session["refresh_token"] = creds.refresh_token
+    session["creds_expiry"] = creds.expiry.isoformat() if creds.expiry else None
+
+
+def get_user_creds(session: dict) -> Optional[Credentials]:
+    """
+    Returns the user's credentials from the session, or None if the session
+    has none and the user needs to log in again.
+    """
+    refresh_token = session.get("refresh_token")
+    if refresh_token:
+        creds_expiry = session.get("creds_expiry")
+        return build_creds(
+            refresh_token,
+            token=session.get("access_token"),
+            expiry=datetime.fromisoformat(creds_expiry) if creds_expiry else None,
+        )
+    creds_json = session.get("creds")
+    if creds_json:
+        # sessions created before only the tokens were stored
+        return Credentials.from_authorized_user_info(json.loads(creds_json))
+    return None
+
 
 class AuthenticatedUser:
     """
@@ -44,21 +174,19 @@ class AuthenticatedUser:
             # Ensure we have an ID token
             if not self.creds.id_token:
                 logger.warning("ID token is missing, trying to refresh credentials...")
-                self.creds.refresh(Request())  # Refresh credentials
+                self.creds.refresh(get_google_auth_request())  # Refresh credentials
 
             # If still missing, raise an error
             if not self.creds.id_token:
                 raise ValueError("No ID token available after refresh.")
     
-            decoded_token = id_token.verify_oauth2_token(
-                self.creds.id_token, Request(), audience=settings.GOOGLE_CLIENT_ID
-            )
+            decoded_token = verify_id_token(self.creds.id_token)
             user_id = decoded_token["sub"]  # 'sub' is the unique user ID
             user_email = decoded_token.get("email")  # 'email' is the user's email address
             return user_id, user_email
         
         except (KeyError, TypeError):
-            self.creds = self.creds.refresh(Request())
+            self.creds = self.creds.refresh(get_google_auth_request())
             if not self.creds.id_token:
                 proxy_user_id = str(uuid.uuid4())
                 logger.error(
@@ -1,16 +1,39 @@
 import base64
 import email
 import logging
-import re
-from typing import Dict, Any
+import time
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Any, List
 
 from bs4 import BeautifulSoup
 from email_validator import validate_email, EmailNotValidError
+from googleapiclient.errors import HttpError
 
 from constants import GENERIC_ATS_DOMAINS
 
 logger = logging.getLogger(__name__)
 
+# Gmail rate limits batches larger than 50 requests
+GMAIL_BATCH_SIZE = 50
+GMAIL_BATCH_RETRIES = 4  # attempts per message, including the first
+GMAIL_BATCH_RETRY_DELAY_SECONDS = 1  # doubled after each retry
+
+# Common automated prefixes and domains, as sets for constant-time lookups
+_AUTOMATED_EMAIL_SEPARATORS = ("", "-", "_", ".")
+AUTOMATED_EMAIL_PREFIXES = frozenset(
+    # "no-reply", "no_reply", "noreply"
+    [f"no{sep}reply" for sep in _AUTOMATED_EMAIL_SEPARATORS]
+    # "do-not-reply", "do_not_reply"
+    + [
+        f"do{sep1}not{sep2}reply"
+        for sep1 in _AUTOMATED_EMAIL_SEPARATORS
+        for sep2 in _AUTOMATED_EMAIL_SEPARATORS
+    ]
+    + ["notifications", "team", "hello"]  # "hello@" is often automated
+)
+AUTOMATED_EMAIL_DOMAINS = frozenset(["smartrecruiters.com"])
+
 
 def clean_whitespace(text: str) -> str:
     """
@@ -31,27 +54,19 @@ def is_automated_email(email: str) -> bool:
     Returns:
     bool: True if automated, False otherwise.
     """
-    # Define patterns for common automated prefixes and domains
-    automated_patterns = [
-        r"^no[-_.]?reply@",  # Matches "no-reply", "no_reply", "noreply"
-        r"^do[-_.]?not[-_.]?reply@",  # Matches "do-not-reply", "do_not_reply"
-        r"^notifications@",  # Matches "notifications@"
-        r"^team@",  # Matches "team@"
-        r"^hello@",  # Matches "hello@" (often automated)
-        r"@smartrecruiters\.com$",  # Matches specific automated domains
-    ]
-
-    # Check against the patterns
-    for pattern in automated_patterns:
-        if re.search(pattern, email, re.IGNORECASE):
-            return True  # It's an automated email
-
-    return False  # It's likely from a person
+    if "@" not in email:
+        return False
+    email = email.lower()
+    return (
+        email.partition("@")[0] in AUTOMATED_EMAIL_PREFIXES
+        or email.rpartition("@")[2] in AUTOMATED_EMAIL_DOMAINS
+    )
 
 
 def is_valid_email(email: str) -> bool:
     try:
-        validate_email(email)
+        # syntax only; a DNS deliverability lookup per email is too slow for inbox scans
+        validate_email(email, check_deliverability=False)
         return True
     except EmailNotValidError as e:
         # email is not valid, exception message is human-readable
@@ -84,86 +99,151 @@ def get_email_content(email_data: Dict[str, Any]) -> str:
     return text_content
 
 
-def get_email(message_id: str, gmail_instance=None, user_email: str = None):
-    if gmail_instance:
-        try:
-            message = (
+def is_retryable_gmail_error(exception: Exception) -> bool:
+    """
+    Gmail answers batched requests with per-message 429 "too many concurrent
+    requests" and transient 5xx errors, which succeed when sent again.
+    """
+    return isinstance(exception, HttpError) and (
+        exception.resp.status == 429 or exception.resp.status >= 500
+    )
+
+
+def get_emails_batch(message_ids: list, gmail_instance=None, user_email: str = None) -> Dict[str, Any]:
+    """
+    Retrieves several emails with a single batched Gmail API request.
+    Messages rejected with a retryable error are fetched again with backoff.
+
+    Returns a dict mapping each message id to its parse_raw_email result,
+    or {} if that message could not be retrieved. Ids are missing entirely
+    if the whole batch request fails.
+    """
+    emails = {}
+    if not gmail_instance or not message_ids:
+        return emails
+
+    retry_ids = []
+
+    def handle_response(message_id, message, exception):
+        if exception is None:
+            emails[message_id] = parse_raw_email(message_id, message, user_email)
+        elif is_retryable_gmail_error(exception):
+            retry_ids.append(message_id)
+        else:
+            logger.error(f"Error retrieving email with id {message_id}: {exception}")
+            emails[message_id] = {}
+
+    # batch request ids must be unique, but paginated list results can repeat an id
+    pending_ids = list(dict.fromkeys(message_ids))
+    delay = GMAIL_BATCH_RETRY_DELAY_SECONDS
+    for attempt in range(GMAIL_BATCH_RETRIES):
+        if attempt:
+            logger.warning(
+                f"Gmail rate limit hit for {len(pending_ids)} emails. Retrying in {delay} seconds (attempt {attempt + 1})."
+            )
+            time.sleep(delay)
+            delay *= 2
+        retry_ids.clear()
+
+        batch = gmail_instance.new_batch_http_request(callback=handle_response)
+        for message_id in pending_ids:
+            batch.add(
                 gmail_instance.users()
                 .messages()
-                .get(userId="me", id=message_id, format="raw")
-                .execute()
+                .get(userId="me", id=message_id, format="raw"),
+                request_id=message_id,
             )
-            msg_str = base64.urlsafe_b64decode(message["raw"].encode("ASCII")).decode(
-                "utf-8"
-            )
-            mime_msg = email.message_from_string(msg_str)
-            email_data = {
-                "id": message_id,
-                "threadId": message.get("threadId", None),
-                "from": None,
-                "to": None,
-                "subject": None,
-                "date": None,
-                "text_content": None,
-                "html_content": None,
-            }
-
-            # Getting email headers
-            email_data["from"] = clean_whitespace(mime_msg.get("From"))
-            email_data["to"] = clean_whitespace(mime_msg.get("To"))
-            email_data["subject"] = clean_whitespace(mime_msg.get("Subject"))
-            email_data["date"] = mime_msg.get("Date")
-
-            # Exclude if sender is user_email and to is not user_email
-            if user_email:
-                from_addr = email_data["from"] or ""
-                to_addr = email_data["to"] or ""
-                if user_email.lower() in from_addr.lower() and user_email.lower() not in to_addr.lower():
-                    return None
-
-            # Extract body of the email
-            if mime_msg.is_multipart():
-                for part in mime_msg.walk():
-                    content_type = part.get_content_type()
-                    content_disposition = str(part.get("Content-Disposition"))
-                    if (
-                        content_type == "text/plain"
-                        and "attachment" not in content_disposition
-                    ):
-                        email_data["text_content"] = part.get_payload(
-                            decode=True
-                        ).decode(encoding="utf-8", errors="ignore")
-                    elif (
-                        content_type == "text/html"
-                        and "attachment" not in content_disposition
-                    ):
-                        email_data["html_content"] = part.get_payload(
-                            decode=True
-                        ).decode(encoding="utf-8", errors="ignore")
-            else:
-                content_type = mime_msg.get_content_type()
-                if content_type == "text/plain":
-                    email_data["text_content"] = mime_msg.get_payload(
+        try:
+            batch.execute()
+        except Exception as e:
+            logger.exception(f"Error retrieving batch of {len(pending_ids)} emails: {e}")
+            return emails
+
+        if not retry_ids:
+            return emails
+        pending_ids = list(retry_ids)
+
+    for message_id in retry_ids:
+        logger.error(
+            f"Error retrieving email with id {message_id}: still rate limited after {GMAIL_BATCH_RETRIES} attempts"
+        )
+        emails[message_id] = {}
+    return emails
+
+
+def parse_raw_email(message_id: str, message: Dict[str, Any], user_email: str = None):
+    try:
+        msg_str = base64.urlsafe_b64decode(message["raw"].encode("ASCII")).decode(
+            "utf-8"
+        )
+        mime_msg = email.message_from_string(msg_str)
+        email_data = {
+            "id": message_id,
+            "threadId": message.get("threadId", None),
+            "from": None,
+            "to": None,
+            "subject": None,
+            "date": None,
+            "text_content": None,
+            "html_content": None,
+        }
+
+        # Getting email headers
+        email_data["from"] = clean_whitespace(mime_msg.get("From"))
+        email_data["to"] = clean_whitespace(mime_msg.get("To"))
+        email_data["subject"] = clean_whitespace(mime_msg.get("Subject"))
+        email_data["date"] = mime_msg.get("Date")
+
+        # Exclude if sender is user_email and to is not user_email
+        if user_email:
+            from_addr = email_data["from"] or ""
+            to_addr = email_data["to"] or ""
+            if user_email.lower() in from_addr.lower() and user_email.lower() not in to_addr.lower():
+                return None
+
+        # Extract body of the email
+        if mime_msg.is_multipart():
+            for part in mime_msg.walk():
+                content_type = part.get_content_type()
+                content_disposition = str(part.get("Content-Disposition"))
+                if (
+                    content_type == "text/plain"
+                    and "attachment" not in content_disposition
+                ):
+                    email_data["text_content"] = part.get_payload(
                         decode=True
                     ).decode(encoding="utf-8", errors="ignore")
-                elif content_type == "text/html":
-                    email_data["html_content"] = mime_msg.get_payload(
+                elif (
+                    content_type == "text/html"
+                    and "attachment" not in content_disposition
+                ):
+                    email_data["html_content"] = part.get_payload(
                         decode=True
                     ).decode(encoding="utf-8", errors="ignore")
+        else:
+            content_type = mime_msg.get_content_type()
+            if content_type == "text/plain":
+                email_data["text_content"] = mime_msg.get_payload(
+                    decode=True
+                ).decode(encoding="utf-8", errors="ignore")
+            elif content_type == "text/html":
+                email_data["html_content"] = mime_msg.get_payload(
+                    decode=True
+                ).decode(encoding="utf-8", errors="ignore")
+
+        email_data["raw_text_content"] = email_data["text_content"]
+        email_data["text_content"] = get_email_content(email_data)
+
+        return email_data
 
-            email_data["raw_text_content"] = email_data["text_content"]
-            email_data["text_content"] = get_email_content(email_data)
-
-            return email_data
-
-        except Exception as e:
-            logger.exception(f"Error retrieving email with id {message_id}: {e}")
-            return {}
-    return {}
+    except Exception as e:
+        logger.exception(f"Error parsing email with id {message_id}: {e}")
+        return {}
 
 
 def get_email_ids(query: tuple = None, gmail_instance=None):
     email_ids = []
+    seen_ids = set()
     page_token = None
 
     while True:
@@ -179,8 +259,11 @@ def get_email_ids(query: tuple = None, gmail_instance=None):
             .execute()
         )
 
-        if "messages" in response:
-            email_ids.extend(response["messages"])
+        for message in response.get("messages", []):
+            # new mail arriving mid-scan shifts the pages and can repeat an id
+            if message["id"] not in seen_ids:
+                seen_ids.add(message["id"])
+                email_ids.append(message)
 
         page_token = response.get("nextPageToken")
         if not page_token:
@@ -207,14 +290,21 @@ def get_email_parts(msg):
     return None
 
 
+def get_email_header_map(msg):
+    """
+    Returns the message headers as a dict of header name -> value, built in
+    one pass so callers reading several headers can look each up in O(1).
+    The first value wins for repeated headers.
+    """
+    header_map = {}
+    for header in get_email_headers(msg) or []:
+        header_map.setdefault(header.get("name"), header.get("value"))
+    return header_map
+
+
 def get_email_subject_line(msg):
     try:
-        email_headers = get_email_headers(msg)
-        if email_headers:
-            for header in email_headers:
-                key = header.get("name")
-                if key == "Subject":
-                    return header.get("value", "")
+        return get_email_header_map(msg).get("Subject") or ""
     except Exception as e:
         logger.error("Error getting email subject line: %s", e)
     return ""
@@ -237,16 +327,13 @@ def get_last_capitalized_words_in_line(line):
 
 def get_email_from_address(msg):
     try:
-        email_headers = get_email_headers(msg)
-        if email_headers:
-            for header in email_headers:
-                if header.get("name") == "From":
-                    # if value enclosed in <> then extract email address
-                    # else return the value as is
-                    from_address = header.get("value")
-                    if "<" in from_address:
-                        return from_address.split("<")[1].split(">")[0]
-                    return from_address
+        from_address = get_email_header_map(msg).get("From")
+        if from_address:
+            # if value enclosed in <> then extract email address
+            # else return the value as is
+            if "<" in from_address:
+                return from_address.split("<")[1].split(">")[0]
+            return from_address
     except Exception as e:
         logger.error("Error getting email from address: %s", e)
     return ""
@@ -256,12 +343,9 @@ def get_received_at_timestamp(message_id, msg):
     import datetime
 
     try:
-        email_headers = get_email_headers(msg)
-        if email_headers:
-            for header in email_headers:
-                key = header.get("name")
-                if key == "Date":
-                    return header.get("value")
+        received_at = get_email_header_map(msg).get("Date")
+        if received_at:
+            return received_at
     except Exception as e:
         print("msg_%s: %s" % (message_id, e))
     return datetime.datetime.now()  # default if trouble parsing
@@ -276,37 +360,47 @@ def get_email_domain_from_address(email_address):
     return email_address.split("@")[1] if "@" in email_address else ""
 
 
-def clean_email(email_body: str) -> list:
+@lru_cache(maxsize=1)
+def get_email_cleaner():
+    """
+    Loads the spaCy model and cleaning pipeline once and reuses it.
+    The parser and NER components are disabled since cleaning only
+    needs token attributes.
+    """
     import spacy
     from spacy_cleaner import processing, Cleaner
 
+    model = spacy.load("en_core_web_sm", disable=["parser", "ner"])
+    return Cleaner(
+        model,
+        processing.remove_stopword_token,
+        processing.remove_punctuation_token,
+        processing.remove_number_token,
+    )
+
+
+def clean_emails(email_bodies: List[str], batch_size: int = 64) -> list:
+    """
+    Cleans several email bodies in one pass through the spaCy pipeline,
+    which batches documents internally instead of running them one by one.
+    Returns one cleaned string per input body, in order.
+    """
     try:
-        model = spacy.load("en_core_web_sm")
-        pipeline = Cleaner(
-            model,
-            processing.remove_stopword_token,
-            processing.remove_punctuation_token,
-            processing.remove_number_token,
+        return get_email_cleaner().clean(
+            email_bodies, n_process=1, batch_size=batch_size
         )
-        return pipeline.clean([email_body])
     except Exception as e:
-        logger.error("Error cleaning email: %s", e)
+        logger.error("Error cleaning emails: %s", e)
     return []
 
 
+def clean_email(email_body: str) -> list:
+    return clean_emails([email_body])
+
+
 def get_word_frequency(cleaned_email):
     try:
-        word_dict = {}
-        for word in cleaned_email[0].split(" "):
-            if word not in word_dict:
-                word_dict[word] = 1
-            else:
-                word_dict[word] += 1
-
-        word_dict_sorted = sorted(
-            word_dict.items(), key=lambda item: item[1], reverse=True
-        )
-        return word_dict_sorted
+        return Counter(cleaned_email[0].split()).most_common()
     except Exception as e:
         logger.error("Error getting word frequency: %s", e)
     return []
@@ -317,36 +411,36 @@ def get_top_word_in_email_body(msg_id, msg):
         parts = get_email_parts(msg)
         if parts:
             for part in parts:
-                if part.get("mimeType") not in [
-                    "text/plain",
-                    "text/html",
-                ]:
+                mime_type = part.get("mimeType")
+                if mime_type not in ["text/plain", "text/html"]:
+                    continue
+                encoded_data = part.get("body", {}).get("data")
+                if not encoded_data:
                     continue
-                if part.get("mimeType") and part.get("mimeType") in [
-                    "text/plain",
-                    "text/html",
-                ]:
-                    data = base64.urlsafe_b64decode(
-                        part.get("body", {}).get("data", {})
-                    ).decode("utf-8")
-                    # Parse the content with BeautifulSoup
-                    soup = BeautifulSoup(data, "html.parser")
-                    # Extract the plain text from the HTML content
-                    email_text = soup.get_text()
-                    cleaned_text = clean_email(email_text)
-
-                    if cleaned_text:
-                        word_frequency = get_word_frequency(cleaned_text)
-                        top_capitalized_word = get_top_consecutive_capitalized_words(
-                            word_frequency
-                        )
-                        if not top_capitalized_word:
-                            if len(cleaned_text) > 0:
-                                try:
-                                    return cleaned_text[0][0]
-                                except IndexError:
-                                    return cleaned_text[0]
-                        return top_capitalized_word
+                data = base64.urlsafe_b64decode(encoded_data)
+                if mime_type == "text/plain":
+                    # plain text has no markup to strip
+                    email_text = data.decode("utf-8")
+                else:
+                    # Extract the plain text from the HTML content, letting
+                    # BeautifulSoup detect the encoding and decode the bytes once
+                    email_text = BeautifulSoup(data, "lxml").get_text(
+                        separator=" ", strip=True
+                    )
+                cleaned_text = clean_email(email_text)
+
+                if cleaned_text:
+                    word_frequency = get_word_frequency(cleaned_text)
+                    top_capitalized_word = get_top_consecutive_capitalized_words(
+                        word_frequency
+                    )
+                    if not top_capitalized_word:
+                        if len(cleaned_text) > 0:
+                            try:
+                                return cleaned_text[0][0]
+                            except IndexError:
+                                return cleaned_text[0]
+                    return top_capitalized_word
     except Exception as e:
         logger.error("Error getting top word: %s", e)
     return ""
@@ -377,21 +471,15 @@ def get_top_consecutive_capitalized_words(tuples_list):
     """
     try:
         result = []
-        temp_group = []
-        max = float("-inf")
-        for i, (first, second) in enumerate(tuples_list):
-            is_capitalized = first and first[0].isupper()
-
-            if is_capitalized:
-                if not temp_group:
-                    max = second
-                    temp_group.append((first, second))
-                if temp_group and temp_group[-1][1] == second:
-                    # Add to the current group if criteria match
-                    temp_group.append((first, second))
-                if second < max:
-                    break
-                result.append(first)
+        top_frequency = None
+        for word, frequency in tuples_list:
+            if not (word and word[0].isupper()):
+                continue
+            if top_frequency is None:
+                top_frequency = frequency
+            elif frequency < top_frequency:
+                break
+            result.append(word)
         return " ".join(result)
     except Exception as e:
         logger.error("Error getting top consecutive capitalized words: %s", e)